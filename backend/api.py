@@ -1,8 +1,25 @@
-from fastapi import FastAPI, HTTPException
+import hashlib
+import json
+from datetime import date
+from functools import partial
+from typing import AsyncIterator, Callable, List
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 from pydantic import ValidationError
-from models import UserState, OptStage
-from calculators import get_post_completion_opt_timeline, get_stem_opt_timeline
+import models
+import schemas
+import calculators
+from models import UserState
+from calculators import get_opt_timeline
+from exporters import (
+    CHUNK_SIZE, ICS_FOOTER, parse_jsonl_line, render_students,
+    student_uid, ics_header, ics_dtstamp, ics_student, csv_header, csv_student
+)
 
 app = FastAPI()
 
@@ -13,8 +30,129 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Compress large (e.g. batch) responses; small single-student payloads are left as is
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Upper bound on records per POST /validate/batch request
+MAX_BATCH_SIZE = 1000
+
+# Bump when rules or response shapes change; it is the only salt when the module files
+# cannot be read (e.g. zipapp deploys)
+RULES_REVISION = 1
+
+def _rules_version() -> str:
+    """
+    Fingerprint of the modules that shape responses (models, schemas, calculators, api)
+    plus RULES_REVISION, so a deploy that changes a rule or message changes every ETag.
+    """
+    digest = hashlib.sha256(str(RULES_REVISION).encode("utf-8"))
+    for path in (models.__file__, schemas.__file__, calculators.__file__, __file__):
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except (OSError, TypeError):
+            return f"rev{RULES_REVISION}"
+    return digest.hexdigest()[:16]
+
+RULES_VERSION = _rules_version()
+
+# Boolean query parameters; pydantic parses them case-insensitively
+_BOOL_FIELDS = {name for name, field in UserState.model_fields.items() if field.annotation is bool}
+
+def build_validation_result(data: dict) -> dict:
+    """
+    Validates a single record and returns the unified response body.
+    Raises pydantic.ValidationError if the record is invalid.
+    """
+    # 1. Validate Input (Pydantic models.py)
+    user_state = UserState(**data)
+
+    # 2. Calculate Timeline based on the validated state
+    timeline = get_opt_timeline(user_state)
+
+    # 3. Return Unified Response
+    return {
+        "status": "valid",
+        "user_state": user_state.model_dump(),
+        "timeline": timeline.model_dump() if timeline else None
+    }
+
+def format_validation_errors(e: ValidationError) -> List[dict]:
+    errors = []
+    for err in e.errors():
+        field = loc[-1] if (loc := err.get('loc')) else 'general'
+        errors.append({
+            "field": str(field),
+            "message": err['msg']
+        })
+    return errors
+
+def canonical_inputs(params) -> dict:
+    """
+    Keeps only the UserState fields of a query string and lowercases boolean values,
+    so polls that differ only in ignored parameters (cache busters, student_id) or in
+    "True" vs "true" share one ETag. No validation is run.
+    """
+    return {
+        key: value.lower() if key in _BOOL_FIELDS else value
+        for key, value in params.items() if key in UserState.model_fields
+    }
+
+def compute_etag(data: dict, today: date = None) -> str:
+    """
+    Strong ETag for a request: a hash of the canonical (sorted) inputs, today's date and
+    RULES_VERSION. Validation depends on date.today(), so the tag rolls over at midnight.
+    """
+    today = today or date.today()
+    canonical = json.dumps(
+        {"inputs": data, "today": today.isoformat(), "rules": RULES_VERSION},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return '"' + hashlib.sha256(canonical.encode("utf-8")).hexdigest() + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2).
+    "*" is not handled here: it only matches once the request has validated.
+    """
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def conditional_get(request: Request, render) -> Response:
+    """
+    Serves a GET derived from the query string with ETag / If-None-Match support.
+    A matching tag is checked before any validation, so unchanged polls skip all work.
+    "If-None-Match: *" returns 304 only for input that validates.
+    """
+    data = canonical_inputs(request.query_params)
+    etag = compute_etag(data)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        body = render(build_validation_result(data))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail={"status": "invalid", "errors": format_validation_errors(e)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if if_none_match and if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=json.dumps(body, default=str),
+        media_type="application/json",
+        headers=headers
+    )
+
 @app.post("/validate")
 async def validate_user_state(data: dict):
     """
@@ -23,35 +161,178 @@ async def validate_user_state(data: dict):
     Raises 400 with specific error messages if validation fails.
     """
     try:
-        # 1. Validate Input (Pydantic models.py)
-        user_state = UserState(**data)
-        
-        # 2. Calculate Timeline based on the validated state
-        timeline = None
-        if user_state.opt_stage == OptStage.POST_COMPLETION:
-            timeline = get_post_completion_opt_timeline(user_state.program_end_date)
-        elif user_state.opt_stage == OptStage.STEM_EXTENSION:
-            timeline = get_stem_opt_timeline(user_state.program_end_date)
-            
-        # 3. Return Unified Response
-        return {
-            "status": "valid",
-            "user_state": user_state.model_dump(),
-            "timeline": timeline.model_dump() if timeline else None
-        }
+        return build_validation_result(data)
     except ValidationError as e:
-        errors = []
-        for err in e.errors():
-            field = loc[-1] if (loc := err.get('loc')) else 'general'
-            errors.append({
-                "field": str(field),
-                "message": err['msg']
-            })
-        
-        raise HTTPException(status_code=400, detail={"status": "invalid", "errors": errors})
+        raise HTTPException(status_code=400, detail={"status": "invalid", "errors": format_validation_errors(e)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/validate")
+async def get_validation(request: Request):
+    """
+    Same as POST /validate, with the UserState fields passed as query parameters.
+    Responses carry a strong ETag; a matching If-None-Match returns 304.
+    """
+    return conditional_get(request, lambda result: result)
+
+@app.get("/timeline")
+async def get_timeline(request: Request):
+    """
+    Returns only the projected timeline for the UserState given as query parameters.
+    Responses carry a strong ETag; a matching If-None-Match returns 304.
+    """
+    return conditional_get(request, lambda result: {"timeline": result["timeline"]})
+
+@app.post("/validate/batch")
+def validate_batch(records: List[dict]):
+    """
+    Validates a list of up to MAX_BATCH_SIZE records in one request.
+    Each entry is either the POST /validate body or {"status": "invalid", "errors": [...]}.
+    Large responses are gzip-compressed when the client accepts it.
+    A plain def, so FastAPI runs the CPU-bound loop in its threadpool instead of the event loop.
+    Raises 413 if the batch is too large.
+    """
+    if len(records) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(records)} records exceeds the limit of {MAX_BATCH_SIZE}."
+        )
+
+    results = []
+    for data in records:
+        try:
+            results.append(build_validation_result(data))
+        except ValidationError as e:
+            results.append({"status": "invalid", "errors": format_validation_errors(e)})
+    return results
+
+# Longest JSON Lines record accepted by the export endpoints; longer lines are dropped
+MAX_LINE_SIZE = CHUNK_SIZE
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for generators that consume the request body themselves.
+    Starlette's disconnect listener would compete with them for receive() messages, so
+    only that listener is skipped: reading the body already raises ClientDisconnect.
+    """
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+async def iter_jsonl_batches(request: Request) -> AsyncIterator[list]:
+    """
+    Reads a JSON Lines request body as it arrives and yields lists of raw lines (bytes)
+    covering about CHUNK_SIZE bytes of input each. Only newly received bytes are searched
+    for newlines. Lines longer than MAX_LINE_SIZE are replaced by a ValueError and
+    skipped up to the next newline, so the buffer never exceeds one line plus one chunk.
+    """
+    buffer = bytearray()
+    skipping = False
+    batch = []
+    size = 0
+    async for chunk in request.stream():
+        search_from = len(buffer)
+        buffer += chunk
+        while (newline := buffer.find(b"\n", search_from)) != -1:
+            line = bytes(buffer[:newline])
+            del buffer[:newline + 1]
+            search_from = 0
+            if skipping:
+                skipping = False
+            elif line.strip():
+                batch.append(line)
+                size += len(line)
+        if skipping:
+            buffer.clear()
+        elif len(buffer) > MAX_LINE_SIZE:
+            batch.append(ValueError(f"Line exceeds {MAX_LINE_SIZE} bytes."))
+            skipping = True
+            buffer.clear()
+        if size >= CHUNK_SIZE:
+            yield batch
+            batch = []
+            size = 0
+    if buffer.strip() and not skipping:
+        batch.append(bytes(buffer))
+    if batch:
+        yield batch
+
+def render_jsonl_batch(lines: list, render_student: Callable[..., str], start: int) -> str:
+    """Parses and renders one batch from iter_jsonl_batches; runs in the threadpool."""
+    records = (line if isinstance(line, Exception) else parse_jsonl_line(line) for line in lines)
+    return render_students(records, render_student, None, start)
+
+async def stream_export(request: Request, header: str, render_student: Callable[..., str], footer: str = ""):
+    """
+    Streams header, rendered students and footer for a JSON Lines cohort body.
+    The header goes out before the body is read; each batch is parsed and rendered in
+    the threadpool, so the event loop only splits lines.
+    """
+    yield header
+    start = 1
+    async for batch in iter_jsonl_batches(request):
+        chunk = await run_in_threadpool(render_jsonl_batch, batch, render_student, start)
+        start += len(batch)
+        if chunk:
+            yield chunk
+    if footer:
+        yield footer
+
+@app.get("/timeline.ics")
+def get_timeline_ics(request: Request):
+    """
+    Returns the timeline for the UserState given as query parameters as an iCalendar file.
+    Raises 400 if the parameters are invalid, 404 if the OPT stage has no timeline.
+    """
+    data = dict(request.query_params)
+    try:
+        user_state = UserState(**data)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail={"status": "invalid", "errors": format_validation_errors(e)})
+
+    timeline = get_opt_timeline(user_state)
+    if not timeline:
+        raise HTTPException(status_code=404, detail=f"No timeline for {user_state.opt_stage.value} OPT.")
+
+    student_id = data.get("student_id", "1")
+    uid = student_uid(data, user_state)
+    return Response(
+        content=ics_header() + ics_student(student_id, uid, user_state, timeline.to_sorted_list()) + ICS_FOOTER,
+        media_type="text/calendar",
+        headers={"Content-Disposition": 'attachment; filename="opt-timeline.ics"'}
+    )
+
+@app.post("/export/ics")
+async def export_ics(request: Request):
+    """
+    Streams one iCalendar file with the milestones of every valid record in the cohort.
+    The body is JSON Lines (one UserState object per line) and is read incrementally.
+    Invalid records are skipped; use POST /validate/batch to find them.
+    """
+    render = partial(ics_student, dtstamp=ics_dtstamp())
+    return BodyStreamingResponse(
+        stream_export(request, ics_header(), render, ICS_FOOTER),
+        media_type="text/calendar",
+        headers={"Content-Disposition": 'attachment; filename="opt-timelines.ics"'}
+    )
+
+@app.post("/export/csv")
+async def export_csv(request: Request):
+    """
+    Streams a CSV deadline sheet (student_id, opt_stage, date, event) for the cohort.
+    The body is JSON Lines (one UserState object per line) and is read incrementally.
+    Invalid records are skipped; use POST /validate/batch to find them.
+    """
+    return BodyStreamingResponse(
+        stream_export(request, csv_header(), csv_student),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="opt-deadlines.csv"'}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,5 +1,7 @@
 from datetime import date, timedelta
+from typing import Optional
 from schemas import OptTimeline
+from models import UserState, OptStage
 
 def get_post_completion_opt_timeline(program_end_date: date) -> OptTimeline:
     """
@@ -51,3 +53,15 @@ def get_unemployment_limit_date(opt_start_date: date, max_days: int) -> date:
     Logic: Input + max_days
     """
     return opt_start_date + timedelta(days=max_days)
+
+def get_opt_timeline(user_state: UserState) -> Optional[OptTimeline]:
+    """
+    Projects the timeline matching the user's OPT stage.
+    
+    Returns None for Pre-Completion OPT, which has no projected timeline.
+    """
+    if user_state.opt_stage == OptStage.POST_COMPLETION:
+        return get_post_completion_opt_timeline(user_state.program_end_date)
+    elif user_state.opt_stage == OptStage.STEM_EXTENSION:
+        return get_stem_opt_timeline(user_state.program_end_date)
+    return None
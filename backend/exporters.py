@@ -0,0 +1,240 @@
+import csv
+import hashlib
+import io
+import json
+import re
+import sys
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+from models import UserState
+from calculators import get_opt_timeline
+
+# Called with (student_id, message) for each record that cannot be exported; the record is skipped
+InvalidHandler = Optional[Callable[[str, str], None]]
+
+# Output is buffered into chunks of about this many characters, so a streaming response
+# pays its per-chunk overhead every few hundred students rather than per student
+CHUNK_SIZE = 64 * 1024
+
+CSV_HEADER = ["student_id", "opt_stage", "date", "event"]
+
+ICS_FOOTER = "END:VCALENDAR\r\n"
+
+def parse_jsonl_line(line):
+    """
+    Parses one JSON Lines record (str or UTF-8 bytes).
+    Returns the dict, or a ValueError describing the line so it is reported rather than fatal.
+    """
+    try:
+        return json.loads(line)
+    except ValueError as e:  # JSONDecodeError and UnicodeDecodeError
+        return ValueError(f"Invalid JSON: {e}")
+
+def student_uid(data: dict, user_state: UserState) -> str:
+    """
+    Stable identifier for a student's calendar events: the given "student_id", or a hash
+    of the validated state when there is none, so unnamed students never share UIDs.
+    """
+    if "student_id" in data:
+        return str(data["student_id"])
+    canonical = json.dumps(user_state.model_dump(), sort_keys=True, default=str)
+    return "state-" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+def iter_milestones(records: Iterable, on_invalid: InvalidHandler = None, start: int = 1) -> Iterator[tuple]:
+    """
+    Lazily yields (student_id, uid, user_state, milestones) per record.
+
+    Timelines are computed one student at a time as the caller iterates, so memory
+    stays constant regardless of cohort size. Records without a "student_id" key are
+    labelled by their position in the input, counting from `start`; `uid` comes from
+    student_uid. Records that are not dicts (e.g. a ValueError from a reader) or fail
+    validation go to `on_invalid`.
+    """
+    for index, data in enumerate(records, start=start):
+        if not isinstance(data, dict):
+            if on_invalid:
+                message = str(data) if isinstance(data, Exception) else "Record is not an object of UserState fields."
+                on_invalid(str(index), message)
+            continue
+
+        student_id = str(data.get("student_id", index))
+        try:
+            user_state = UserState.model_validate(data)
+        except ValidationError as e:
+            if on_invalid:
+                on_invalid(student_id, "; ".join(err["msg"] for err in e.errors()))
+            continue
+
+        timeline = get_opt_timeline(user_state)
+        if timeline:
+            yield student_id, student_uid(data, user_state), user_state, timeline.to_sorted_list()
+
+def render_students(records: Iterable, render_student: Callable[..., str],
+                    on_invalid: InvalidHandler = None, start: int = 1) -> str:
+    """Renders a batch of records with `render_student` (e.g. ics_student, csv_student) as one string."""
+    return "".join(
+        render_student(*student) for student in iter_milestones(records, on_invalid, start)
+    )
+
+def _buffered(parts: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """Joins small strings into chunks of at least `chunk_size` characters (the last may be shorter)."""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+def _ics_escape(text: str) -> str:
+    """Escapes a TEXT value per RFC 5545 3.3.11."""
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+                .replace(",", "\\,").replace("\n", "\\n"))
+
+def _ics_fold(line: str) -> str:
+    """
+    Folds a content line to 75 octets of UTF-8 per RFC 5545 3.1.
+    Continuation lines start with a space, and multi-byte characters are never split.
+    """
+    if len(line.encode("utf-8")) <= 75:
+        return line
+    parts = []
+    current = []
+    size = 0
+    limit = 75
+    for char in line:
+        octets = len(char.encode("utf-8"))
+        if size + octets > limit:
+            parts.append("".join(current))
+            current = []
+            size = 0
+            limit = 74  # the leading space of a continuation line takes one octet
+        current.append(char)
+        size += octets
+    parts.append("".join(current))
+    return "\r\n ".join(parts)
+
+def ics_header() -> str:
+    return "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Immigration Agent//OPT Timeline//EN\r\nCALSCALE:GREGORIAN\r\n"
+
+def ics_dtstamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def ics_student(student_id: str, uid: str, user_state: UserState, milestones: list, dtstamp: str = None) -> str:
+    """Renders one all-day VEVENT per milestone of a student; UIDs are built from `uid`."""
+    dtstamp = dtstamp or ics_dtstamp()
+    lines = []
+    for event_date, description in milestones:
+        slug = re.sub(r"[^a-z0-9]+", "-", description.lower()).strip("-")
+        lines += [
+            "BEGIN:VEVENT",
+            _ics_fold(f"UID:{_ics_escape(uid)}-{slug}@immigration-agent"),
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;VALUE=DATE:{event_date.strftime('%Y%m%d')}",
+            _ics_fold(f"SUMMARY:{_ics_escape(description)} ({_ics_escape(student_id)})"),
+            _ics_fold(f"DESCRIPTION:{_ics_escape(user_state.opt_stage.value)} OPT milestone"),
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ]
+    return "\r\n".join(lines) + "\r\n"
+
+def csv_header() -> str:
+    return ",".join(CSV_HEADER) + "\r\n"
+
+def csv_student(student_id: str, uid: str, user_state: UserState, milestones: list) -> str:
+    """Renders one CSV row per milestone of a student (`uid` is only used by ics_student)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for event_date, description in milestones:
+        writer.writerow([student_id, user_state.opt_stage.value, event_date.isoformat(), description])
+    return buffer.getvalue()
+
+def iter_ics(records: Iterable, on_invalid: InvalidHandler = None, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Streams an iCalendar (.ics) document with one all-day VEVENT per milestone.
+
+    Yields the calendar header on its own first, then chunks of about `chunk_size`
+    characters, then the footer.
+    """
+    render = partial(ics_student, dtstamp=ics_dtstamp())
+    yield ics_header()
+    yield from _buffered(
+        (render(*student) for student in iter_milestones(records, on_invalid)), chunk_size
+    )
+    yield ICS_FOOTER
+
+def iter_csv(records: Iterable, on_invalid: InvalidHandler = None, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Streams a CSV deadline sheet (student_id, opt_stage, date, event).
+
+    Yields the header row on its own first, then chunks of about `chunk_size` characters.
+    """
+    yield csv_header()
+    yield from _buffered(
+        (csv_student(*student) for student in iter_milestones(records, on_invalid)), chunk_size
+    )
+
+def _read_records(stream) -> Iterator:
+    """
+    Reads JSON Lines (one UserState object per line) or a CSV file with a header row.
+    Lines that cannot be parsed are yielded as ValueErrors for iter_milestones to report.
+    """
+    first = stream.readline()
+    while first and not first.strip():
+        first = stream.readline()
+    if not first:
+        return
+    if first.lstrip().startswith("{"):
+        yield parse_jsonl_line(first)
+        for line in stream:
+            if line.strip():
+                yield parse_jsonl_line(line)
+    else:
+        reader = csv.DictReader(stream, fieldnames=next(csv.reader([first])))
+        for row in reader:
+            if None in row:
+                yield ValueError(f"Line {reader.line_num} has more cells than the header.")
+                continue
+            # Empty CSV cells mean "not provided", not an empty string
+            yield {key: value for key, value in row.items() if value not in (None, "")}
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export OPT timeline milestones for a cohort as .ics or CSV.")
+    parser.add_argument("input", help="JSON Lines or CSV file of UserState records ('-' for stdin)")
+    parser.add_argument("-f", "--format", choices=["ics", "csv"], default="ics")
+    parser.add_argument("-o", "--output", default="-", help="Output file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    skipped = 0
+    def report_invalid(student_id: str, message: str):
+        nonlocal skipped
+        skipped += 1
+        print(f"Skipping student {student_id}: {message}", file=sys.stderr)
+
+    exporter = iter_ics if args.format == "ics" else iter_csv
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    # newline="" so the CRLF line endings produced by the exporters are written unchanged
+    target = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        for chunk in exporter(_read_records(source), on_invalid=report_invalid):
+            target.write(chunk)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    if skipped:
+        print(f"{skipped} invalid record(s) skipped.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
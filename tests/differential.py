@@ -0,0 +1,311 @@
+"""
+Differential harness: reference per-record path vs. batch / cached / streaming paths.
+
+The reference builds each record with UserState and projects its timeline with the
+calculators.py functions directly. Every other path must produce identical output,
+including error messages, for a randomized cohort generated from a fixed seed. The
+harness also runs each validators.py check (with current_date = today) on the
+user_state every path returns, so the I-20 30-day rule and the 90/150 unemployment
+limits must agree as well. Each run is repeated on two consecutive (frozen) days,
+so records sitting on the date.today() boundaries flip between valid and invalid.
+
+Usage (from the project root):
+    python tests/differential.py --size 100000 --seed 0
+
+New paths register in CANDIDATES as (function, require_speedup). Optimizations set
+require_speedup=True and must be faster than their baseline (speedup >= 1.0x).
+Paths that exist for features rather than speed (e.g. GET /validate, which adds
+ETag support) set it to False and are only checked for identical output.
+The script exits 1 on any mismatch or on a required speedup below 1.0x.
+The pytest wrapper (test_differential.py) checks outputs only, since timings
+are too noisy for CI.
+"""
+import sys
+import os
+import csv
+import io
+import json
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlencode
+
+# Add parent and backend directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from starlette.requests import Request
+import models
+import api
+from models import UserState, OptStage
+from calculators import get_post_completion_opt_timeline, get_stem_opt_timeline
+from exporters import iter_csv
+from validators import (
+    validate_standard_opt_eligibility,
+    validate_application_timing,
+    validate_start_date,
+    validate_unemployment_status
+)
+
+# Offsets (days from today) and unemployment counts that sit on either side of a rule
+PROGRAM_END_EDGES = [-61, -60, -59, 0, 364, 365, 366]
+UNEMPLOYMENT_EDGES = [0, 89, 90, 91, 149, 150, 151]
+# Days between I-20 issuance and the date the 30-day rule checks against
+I20_EDGES = [-1, 0, 1, 29, 30, 31]
+
+def generate_cohort(size: int, seed: int, today: date) -> List[dict]:
+    """
+    Generates `size` query-parameter style records (all values are strings).
+    Roughly half the values are drawn from the rule boundaries.
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(size):
+        if rng.random() < 0.5:
+            offset = rng.choice(PROGRAM_END_EDGES)
+        else:
+            offset = rng.randint(-90, 400)
+        program_end = today + timedelta(days=offset)
+
+        if rng.random() < 0.5:
+            unemployment = rng.choice(UNEMPLOYMENT_EDGES)
+        else:
+            unemployment = rng.randint(-1, 200)
+
+        data = {
+            "student_id": f"S{i:06d}",
+            "degree_level": rng.choice(["Bachelor", "Master", "PhD", "Associate"]),
+            "is_stem_degree": rng.choice(["true", "false"]),
+            "program_end_date": program_end.isoformat(),
+            "opt_stage": rng.choice(["Pre", "Post", "STEM"]),
+            "unemployment_days_used": str(unemployment),
+            "has_one_year_enrollment": rng.choice(["true", "false"]),
+        }
+        if rng.random() < 0.3:
+            data["opt_start_date"] = (program_end + timedelta(days=rng.randint(-5, 70))).isoformat()
+        submission = None
+        if rng.random() < 0.3:
+            submission = program_end + timedelta(days=rng.randint(-100, 70))
+            data["application_submission_date"] = submission.isoformat()
+        if rng.random() < 0.5:
+            # Relative to the date validate_application_timing checks against
+            days_since_i20 = rng.choice(I20_EDGES) if rng.random() < 0.7 else rng.randint(-10, 60)
+            data["i20_issuance_date"] = ((submission or today) - timedelta(days=days_since_i20)).isoformat()
+        records.append(data)
+    return records
+
+@contextmanager
+def frozen_today(day: date):
+    """Makes date.today() return `day` inside models.py and api.py."""
+    class FrozenDate(date):
+        @classmethod
+        def today(cls):
+            return day
+
+    originals = (models.date, api.date)
+    models.date = api.date = FrozenDate
+    try:
+        yield
+    finally:
+        models.date, api.date = originals
+
+def normalize(value):
+    """Round-trips through JSON so dates, enums and HTTP bodies compare equal."""
+    return json.loads(json.dumps(value, default=str))
+
+# --- Reference path ---
+
+def _reference_timeline(user_state: UserState):
+    if user_state.opt_stage == OptStage.POST_COMPLETION:
+        return get_post_completion_opt_timeline(user_state.program_end_date)
+    elif user_state.opt_stage == OptStage.STEM_EXTENSION:
+        return get_stem_opt_timeline(user_state.program_end_date)
+    return None
+
+def with_checks(result: dict, today: date) -> dict:
+    """
+    Adds the validators.py results for a valid response's user_state under "checks".
+    Applied to the reference and to every candidate, so no path has to return them itself.
+    """
+    if result.get("status") != "valid":
+        return result
+    user_state = UserState.model_validate(result["user_state"])
+    return dict(result, checks=normalize({
+        "eligibility": validate_standard_opt_eligibility(user_state),
+        "application_timing": validate_application_timing(user_state, current_date=today),
+        "start_date": validate_start_date(user_state),
+        "unemployment": validate_unemployment_status(user_state),
+    }))
+
+def reference_result(data: dict) -> dict:
+    try:
+        user_state = UserState(**data)
+    except ValidationError as e:
+        return normalize({
+            "status": "invalid",
+            "errors": [
+                {"field": str(err["loc"][-1]) if err["loc"] else "general", "message": err["msg"]}
+                for err in e.errors()
+            ]
+        })
+
+    timeline = _reference_timeline(user_state)
+    return normalize({
+        "status": "valid",
+        "user_state": user_state.model_dump(),
+        "timeline": timeline.model_dump() if timeline else None
+    })
+
+def reference_milestone_rows(records: List[dict]) -> List[list]:
+    """The CSV rows a cohort export should contain, built from to_sorted_list()."""
+    rows = []
+    for data in records:
+        try:
+            user_state = UserState(**data)
+        except ValidationError:
+            continue
+        timeline = _reference_timeline(user_state)
+        if not timeline:
+            continue
+        for event_date, description in timeline.to_sorted_list():
+            rows.append([data["student_id"], user_state.opt_stage.value, event_date.isoformat(), description])
+    return rows
+
+# --- Candidate paths ---
+
+def _query_request(data: dict, if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/validate",
+        "query_string": urlencode(data).encode(),
+        "headers": headers,
+    })
+
+def _conditional_get(data: dict, if_none_match: str = None):
+    """Returns (status_code, etag, body) from api.conditional_get."""
+    try:
+        response = api.conditional_get(_query_request(data, if_none_match), lambda result: result)
+    except HTTPException as e:
+        return e.status_code, None, normalize(e.detail)
+    body = json.loads(response.body) if response.body else None
+    return response.status_code, response.headers["etag"], body
+
+def batch_candidate(records: List[dict]) -> List[dict]:
+    results = []
+    for start in range(0, len(records), api.MAX_BATCH_SIZE):
+        results += api.validate_batch(records[start:start + api.MAX_BATCH_SIZE])
+    return normalize(results)
+
+def conditional_get_candidate(records: List[dict]) -> List[dict]:
+    return [body for _, _, body in (_conditional_get(data) for data in records)]
+
+# name -> (candidate, require_speedup)
+CANDIDATES: Dict[str, Tuple[Callable[[List[dict]], List[dict]], bool]] = {
+    # Saves HTTP round trips, not per-record compute
+    "POST /validate/batch": (batch_candidate, False),
+    # Adds ETag headers on top of the reference work
+    "GET /validate (cold)": (conditional_get_candidate, False),
+}
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def _diff(expected: list, actual: list, limit: int = 3) -> List[str]:
+    if len(expected) != len(actual):
+        return [f"length {len(actual)} != reference {len(expected)}"]
+    return [
+        f"record {i}: expected {e!r}, got {a!r}"
+        for i, (e, a) in enumerate(zip(expected, actual)) if e != a
+    ][:limit]
+
+def run_suite(records: List[dict], today: date) -> List[dict]:
+    """
+    Runs every candidate against the reference for `today`.
+    Returns one report per path: name, reference_s, candidate_s, speedup, require_speedup,
+    mismatches.
+    """
+    reports = []
+    with frozen_today(today):
+        expected, reference_s = _timed(lambda rs: [reference_result(d) for d in rs], records)
+        expected_checked = [with_checks(r, today) for r in expected]
+
+        for name, (candidate, require_speedup) in CANDIDATES.items():
+            actual, candidate_s = _timed(candidate, records)
+            actual_checked = [with_checks(r, today) for r in actual]
+            reports.append(_report(name, reference_s, candidate_s,
+                                   _diff(expected_checked, actual_checked), require_speedup))
+
+        # Streaming export: rows must match to_sorted_list() of the reference timelines
+        expected_rows, rows_reference_s = _timed(reference_milestone_rows, records)
+        body, export_s = _timed(lambda rs: "".join(iter_csv(rs)), records)
+        actual_rows = list(csv.reader(io.StringIO(body)))[1:]
+        # A streaming feature, not an optimization
+        reports.append(_report("export CSV rows", rows_reference_s, export_s,
+                               _diff(expected_rows, actual_rows), require_speedup=False))
+
+        # Revalidation: every valid record re-polled with its ETag must be a 304.
+        # Its baseline is the full 200 response it replaces, not the in-process reference.
+        valid = [d for d, r in zip(records, expected) if r["status"] == "valid"]
+        etags, cold_s = _timed(lambda rs: [_conditional_get(d)[1] for d in rs], valid)
+        statuses, warm_s = _timed(lambda rs: [_conditional_get(d, tag)[0] for d, tag in zip(rs, etags)], valid)
+        reports.append(_report("GET /validate 304 vs 200", cold_s, warm_s,
+                               _diff([304] * len(valid), statuses), require_speedup=True))
+
+    # The day after, yesterday's ETags must no longer match
+    with frozen_today(today + timedelta(days=1)):
+        stale = [d["student_id"] for d, tag in zip(valid, etags) if _conditional_get(d, tag)[0] == 304]
+    if stale:
+        reports[-1]["mismatches"].append(f"ETag still matched after date rollover for {stale[:3]}")
+
+    return reports
+
+def _report(name: str, reference_s: float, candidate_s: float, mismatches: List[str],
+            require_speedup: bool) -> dict:
+    return {
+        "name": name,
+        "reference_s": reference_s,
+        "candidate_s": candidate_s,
+        "speedup": reference_s / candidate_s if candidate_s else float("inf"),
+        "require_speedup": require_speedup,
+        "mismatches": mismatches,
+    }
+
+def _verdict(report: dict) -> str:
+    if report["mismatches"]:
+        return "MISMATCH"
+    if report["speedup"] < 1.0:
+        return "SLOW" if report["require_speedup"] else "OK (no speedup required)"
+    return "OK"
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare fast paths against the reference per-record path.")
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    base = date.today()
+    records = generate_cohort(args.size, args.seed, base)
+    failed = False
+    for today in (base, base + timedelta(days=1)):
+        print(f"\n{args.size} records, seed {args.seed}, today = {today}")
+        print(f"{'path':<26}{'baseline s':>12}{'candidate s':>12}{'speedup':>9}  result")
+        for report in run_suite(records, today):
+            verdict = _verdict(report)
+            failed |= verdict in ("MISMATCH", "SLOW")
+            print(f"{report['name']:<26}{report['reference_s']:>12.3f}{report['candidate_s']:>12.3f}"
+                  f"{report['speedup']:>8.2f}x  {verdict}")
+            for line in report["mismatches"]:
+                print(f"    {line}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import sys
+import os
+import json
+from datetime import date, timedelta
+import pytest
+
+# Add parent and backend directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from fastapi.testclient import TestClient
+import api
+from api import app, compute_etag, etag_matches, canonical_inputs, MAX_BATCH_SIZE, MAX_LINE_SIZE
+
+client = TestClient(app)
+
+def valid_params():
+    return {
+        "degree_level": "Master",
+        "is_stem_degree": "true",
+        "program_end_date": date.today().isoformat(),
+        "opt_stage": "Post",
+        "unemployment_days_used": "0",
+        "has_one_year_enrollment": "true"
+    }
+
+def test_get_validate_matches_post():
+    params = valid_params()
+    get_response = client.get("/validate", params=params)
+    post_response = client.post("/validate", json=params)
+    assert get_response.status_code == 200
+    assert get_response.json() == post_response.json()
+    assert get_response.headers["ETag"].startswith('"')
+
+def test_get_timeline_returns_timeline_only():
+    response = client.get("/timeline", params=valid_params())
+    assert response.status_code == 200
+    end = date.today()
+    assert response.json() == {"timeline": {
+        "earliest_filing": (end - timedelta(days=90)).isoformat(),
+        "program_end": end.isoformat(),
+        "latest_filing": (end + timedelta(days=60)).isoformat(),
+        "grace_period_end": (end + timedelta(days=60)).isoformat(),
+        "reporting_period_6_month": None,
+        "reporting_period_12_month": None,
+    }}
+
+def test_if_none_match_returns_304():
+    params = valid_params()
+    etag = client.get("/timeline", params=params).headers["ETag"]
+
+    response = client.get("/timeline", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    # Changed inputs produce a new tag and a full response
+    params["unemployment_days_used"] = "5"
+    response = client.get("/timeline", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_get_validate_invalid_returns_400():
+    params = valid_params()
+    params["opt_stage"] = "STEM"
+    params["is_stem_degree"] = "false"
+    response = client.get("/validate", params=params)
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
+    assert response.json()["detail"]["status"] == "invalid"
+
+def test_compute_etag_is_canonical_and_date_scoped():
+    today = date(2025, 12, 1)
+    a = compute_etag({"opt_stage": "Post", "degree_level": "Master"}, today)
+    b = compute_etag({"degree_level": "Master", "opt_stage": "Post"}, today)
+    assert a == b
+    assert a != compute_etag({"opt_stage": "Post", "degree_level": "Master"}, today + timedelta(days=1))
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', '"abc"')
+    assert not etag_matches('"xyz"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+def test_validate_batch_is_compressed():
+    good = valid_params()
+    bad = dict(good, opt_stage="STEM", is_stem_degree="false")
+    records = [good, bad] * 20
+    response = client.post("/validate/batch", json=records, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    results = response.json()
+    assert len(results) == 40
+    assert results[0] == client.post("/validate", json=good).json()
+    assert results[1]["status"] == "invalid"
+    assert "STEM degree" in results[1]["errors"][0]["message"]
+
+def test_timeline_ics():
+    response = client.get("/timeline.ics", params=valid_params())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert response.text.count("BEGIN:VEVENT") == 4
+
+    params = valid_params()
+    params["opt_stage"] = "STEM"
+    params["is_stem_degree"] = "false"
+    assert client.get("/timeline.ics", params=params).status_code == 400
+
+    # Pre-Completion OPT has no timeline to export
+    params = dict(valid_params(), opt_stage="Pre")
+    assert client.get("/timeline.ics", params=params).status_code == 404
+
+def test_export_streams_cohort():
+    good = dict(valid_params(), student_id="s1")
+    bad = dict(good, student_id="s2", opt_stage="STEM", is_stem_degree="false")
+
+    body = "\n".join(json.dumps(r) for r in [good, bad]) + "\n{not json\n"
+
+    response = client.post("/export/ics", content=body)
+    assert response.status_code == 200
+    assert response.text.startswith("BEGIN:VCALENDAR")
+    assert response.text.endswith("END:VCALENDAR\r\n")
+    assert response.text.count("BEGIN:VEVENT") == 4
+
+    response = client.post("/export/csv", content=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "student_id,opt_stage,date,event"
+    assert len(lines) == 5
+
+def test_if_none_match_star_requires_valid_input():
+    params = valid_params()
+    assert client.get("/validate", params=params, headers={"If-None-Match": "*"}).status_code == 304
+
+    params["opt_stage"] = "STEM"
+    params["is_stem_degree"] = "false"
+    assert client.get("/validate", params=params, headers={"If-None-Match": "*"}).status_code == 400
+
+def test_etag_changes_with_rules_version(monkeypatch):
+    today = date(2025, 12, 1)
+    before = compute_etag({"opt_stage": "Post"}, today)
+    monkeypatch.setattr(api, "RULES_VERSION", "next-deploy")
+    assert compute_etag({"opt_stage": "Post"}, today) != before
+
+def test_validate_batch_rejects_oversized_batch():
+    response = client.post("/validate/batch", json=[valid_params()] * (MAX_BATCH_SIZE + 1))
+    assert response.status_code == 413
+
+def test_export_reads_body_incrementally():
+    records = [dict(valid_params(), student_id=f"s{i}") for i in range(300)]
+    lines = [(json.dumps(r) + "\n").encode() for r in records]
+
+    def body():
+        # Split records across chunk boundaries
+        data = b"".join(lines)
+        for i in range(0, len(data), 1000):
+            yield data[i:i + 1000]
+
+    response = client.post("/export/csv", content=body())
+    rows = response.text.strip().splitlines()
+    assert len(rows) == 1 + 300 * 4
+    assert rows[-1].startswith("s299,")
+
+def test_etag_ignores_non_field_params_and_bool_case():
+    params = valid_params()
+    etag = client.get("/validate", params=params).headers["ETag"]
+
+    variant = dict(params, is_stem_degree="True", student_id="s1", _="1712345678")
+    response = client.get("/validate", params=variant, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    assert canonical_inputs({"is_stem_degree": "TRUE", "cb": "1"}) == {"is_stem_degree": "true"}
+
+def test_rules_version_falls_back_without_module_files(monkeypatch):
+    monkeypatch.setattr(api.models, "__file__", None)
+    assert api._rules_version() == f"rev{api.RULES_REVISION}"
+
+def test_timeline_ics_uids_differ_between_students():
+    a = client.get("/timeline.ics", params=valid_params()).text
+    b = client.get("/timeline.ics", params=dict(valid_params(), degree_level="PhD")).text
+    uid = lambda body: {line for line in body.split("\r\n") if line.startswith("UID:")}
+    assert uid(a) and not uid(a) & uid(b)
+
+def test_export_drops_oversized_lines():
+    good = json.dumps(dict(valid_params(), student_id="s1"))
+
+    def body():
+        # An unterminated giant line in small chunks, then a normal record
+        for _ in range(2 * MAX_LINE_SIZE // 4096):
+            yield b"x" * 4096
+        yield b"\n" + good.encode() + b"\n"
+
+    response = client.post("/export/csv", content=body())
+    assert response.status_code == 200
+    rows = response.text.strip().splitlines()
+    assert len(rows) == 1 + 4
+    assert rows[1].startswith("s1,")
+
+def test_body_streaming_response_disconnect_and_background():
+    import asyncio
+    from starlette.background import BackgroundTask
+    from starlette.requests import ClientDisconnect
+    from api import BodyStreamingResponse
+
+    ran = []
+    async def gen():
+        yield "x"
+
+    async def broken_send(message):
+        raise OSError("connection reset")
+
+    async def ok_send(message):
+        pass
+
+    response = BodyStreamingResponse(gen(), background=BackgroundTask(ran.append, True))
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(response({"type": "http"}, None, broken_send))
+
+    response = BodyStreamingResponse(gen(), background=BackgroundTask(ran.append, True))
+    asyncio.run(response({"type": "http"}, None, ok_send))
+    assert ran == [True]
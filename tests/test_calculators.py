@@ -6,7 +6,8 @@ import pytest
 # Add parent and backend directory to path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
 
-from calculators import get_post_completion_opt_timeline, get_stem_opt_timeline, get_unemployment_limit_date
+from models import UserState, DegreeLevel, OptStage
+from calculators import get_post_completion_opt_timeline, get_stem_opt_timeline, get_unemployment_limit_date, get_opt_timeline
 
 def test_get_post_completion_opt_timeline():
     # Test case from prompt
@@ -55,3 +56,14 @@ def test_get_unemployment_limit_date():
     limit = get_unemployment_limit_date(start, 90)
     assert limit == date(2025, 4, 1)
 
+
+def test_get_opt_timeline_dispatches_on_stage():
+    end = date.today()
+    post = UserState(degree_level=DegreeLevel.MASTER, is_stem_degree=True,
+                     program_end_date=end, opt_stage=OptStage.POST_COMPLETION)
+    stem = post.model_copy(update={"opt_stage": OptStage.STEM_EXTENSION})
+    pre = post.model_copy(update={"opt_stage": OptStage.PRE_COMPLETION})
+
+    assert get_opt_timeline(post) == get_post_completion_opt_timeline(end)
+    assert get_opt_timeline(stem) == get_stem_opt_timeline(end)
+    assert get_opt_timeline(pre) is None
@@ -0,0 +1,51 @@
+import sys
+import os
+from datetime import date, timedelta
+import pytest
+
+# Add parent and backend directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from differential import generate_cohort, run_suite, frozen_today, reference_result, with_checks, _verdict
+
+TODAY = date(2025, 12, 20)
+
+def test_generate_cohort_is_deterministic():
+    assert generate_cohort(50, seed=7, today=TODAY) == generate_cohort(50, seed=7, today=TODAY)
+    assert generate_cohort(50, seed=7, today=TODAY) != generate_cohort(50, seed=8, today=TODAY)
+
+def test_frozen_today_moves_the_60_day_boundary():
+    record = {
+        "degree_level": "Master",
+        "is_stem_degree": "true",
+        "program_end_date": (TODAY - timedelta(days=60)).isoformat(),
+        "opt_stage": "Post",
+    }
+    with frozen_today(TODAY):
+        assert reference_result(record)["status"] == "valid"
+    with frozen_today(TODAY + timedelta(days=1)):
+        result = reference_result(record)
+        assert result["status"] == "invalid"
+        assert "more than 60 days in the past" in result["errors"][0]["message"]
+
+@pytest.mark.parametrize("today", [TODAY, TODAY + timedelta(days=1)])
+def test_fast_paths_match_reference(today):
+    records = generate_cohort(2000, seed=0, today=TODAY)
+    for report in run_suite(records, today):
+        assert not report["mismatches"], report
+
+def test_cohort_covers_validator_boundaries():
+    records = generate_cohort(2000, seed=0, today=TODAY)
+    with frozen_today(TODAY):
+        checks = [with_checks(r, TODAY)["checks"] for r in map(reference_result, records) if r["status"] == "valid"]
+    assert any(c["unemployment"] for c in checks)
+    assert any("I-20 issuance" in m for c in checks for m in c["application_timing"])
+    assert any("before I-20 issuance" in m for c in checks for m in c["application_timing"])
+
+def test_verdict_flags_required_speedups():
+    report = {"mismatches": [], "speedup": 0.5, "require_speedup": True}
+    assert _verdict(report) == "SLOW"
+    assert _verdict(dict(report, require_speedup=False)) == "OK (no speedup required)"
+    assert _verdict(dict(report, speedup=1.5)) == "OK"
+    assert _verdict(dict(report, mismatches=["x"])) == "MISMATCH"
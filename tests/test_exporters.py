@@ -0,0 +1,153 @@
+import sys
+import os
+import csv
+import io
+import json
+from datetime import date, timedelta
+import pytest
+
+# Add parent and backend directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from exporters import iter_ics, iter_csv, iter_milestones, main, CSV_HEADER, _ics_fold
+
+def record(student_id, **overrides):
+    data = {
+        "student_id": student_id,
+        "degree_level": "Master",
+        "is_stem_degree": True,
+        "program_end_date": date.today().isoformat(),
+        "opt_stage": "Post",
+    }
+    data.update(overrides)
+    return data
+
+def invalid_record(student_id):
+    # STEM Extension without a STEM degree
+    return record(student_id, opt_stage="STEM", is_stem_degree=False)
+
+def test_iter_milestones_is_lazy():
+    def records():
+        yield record("a")
+        raise AssertionError("second record should not be read yet")
+
+    milestones = iter_milestones(records())
+    student_id, uid, user_state, events = next(milestones)
+    assert student_id == "a"
+    assert len(events) == 4
+
+def test_iter_milestones_skips_invalid_and_pre_completion():
+    invalid = []
+    records = [record("a"), invalid_record("b"), record("c", opt_stage="Pre"), record("d", opt_stage="STEM")]
+    result = list(iter_milestones(records, on_invalid=lambda sid, e: invalid.append(sid)))
+    assert [sid for sid, _, _, _ in result] == ["a", "d"]
+    assert invalid == ["b"]
+
+def test_iter_ics():
+    chunks = list(iter_ics([record("a"), invalid_record("b")]))
+    assert chunks[0].startswith("BEGIN:VCALENDAR\r\n")
+    assert chunks[-1] == "END:VCALENDAR\r\n"
+
+    body = "".join(chunks)
+    assert body.count("BEGIN:VEVENT") == 4
+    assert f"DTSTART;VALUE=DATE:{(date.today() - timedelta(days=90)).strftime('%Y%m%d')}" in body
+    assert "SUMMARY:Earliest Filing Date (a)" in body
+    assert "UID:a-earliest-filing-date@immigration-agent" in body
+    assert all(len(line) <= 75 for line in body.split("\r\n"))
+
+def test_iter_ics_escapes_and_folds_student_id():
+    body = "".join(iter_ics([record("Doe, Jane; " + "x" * 80)]))
+    assert "Doe\\, Jane\\; " in body
+    assert all(len(line) <= 75 for line in body.split("\r\n"))
+
+def test_ics_fold_counts_utf8_octets():
+    student_id = "José Müller-Øverlândé " * 6
+    body = "".join(iter_ics([record(student_id)]))
+    lines = body.split("\r\n")
+    assert all(len(line.encode("utf-8")) <= 75 for line in lines)
+    # Unfolding restores the original text without splitting characters
+    assert f"({student_id})" in body.replace("\r\n ", "")
+
+    assert _ics_fold("é" * 40) == "é" * 37 + "\r\n " + "é" * 3
+
+def test_iter_ics_and_csv_buffer_students_into_chunks():
+    records = [record(f"s{i}") for i in range(200)]
+    chunks = list(iter_csv(records, chunk_size=1000))
+    assert chunks[0] == ",".join(CSV_HEADER) + "\r\n"
+    assert len(chunks) < 200
+    assert all(len(chunk) >= 1000 for chunk in chunks[1:-1])
+
+    chunks = list(iter_ics(records, chunk_size=10000))
+    assert chunks[0].startswith("BEGIN:VCALENDAR") and "VEVENT" not in chunks[0]
+    assert chunks[-1] == "END:VCALENDAR\r\n"
+    assert len(chunks) < 200
+
+def test_iter_milestones_reports_non_dict_records():
+    invalid = []
+    records = [ValueError("Invalid JSON"), ["not", "a", "dict"], {1: "bad key"}, record("ok")]
+    result = list(iter_milestones(records, on_invalid=lambda sid, message: invalid.append((sid, message))))
+    assert [sid for sid, _, _, _ in result] == ["ok"]
+    assert [sid for sid, _ in invalid] == ["1", "2", "3"]
+    assert invalid[0][1] == "Invalid JSON"
+
+def test_iter_csv():
+    body = "".join(iter_csv([record("a"), invalid_record("b"), record("c")]))
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows[0] == CSV_HEADER
+    assert len(rows) == 1 + 4 + 4
+    assert rows[1] == ["a", "Post", (date.today() - timedelta(days=90)).isoformat(), "Earliest Filing Date"]
+    assert {row[0] for row in rows[1:]} == {"a", "c"}
+
+def test_cli_reads_jsonl_and_csv(tmp_path, capsys):
+    jsonl = tmp_path / "cohort.jsonl"
+    jsonl.write_text("\n".join(json.dumps(r) for r in [record("a"), invalid_record("b")]) + "\n")
+    out = tmp_path / "out.csv"
+    main([str(jsonl), "--format", "csv", "--output", str(out)])
+    rows = list(csv.reader(io.StringIO(out.read_text())))
+    assert len(rows) == 1 + 4
+    assert "Skipping student b" in capsys.readouterr().err
+
+    cohort_csv = tmp_path / "cohort.csv"
+    cohort_csv.write_text(
+        "student_id,degree_level,is_stem_degree,program_end_date,opt_stage,unemployment_days_used\n"
+        f"a,Master,true,{date.today().isoformat()},STEM,\n"
+    )
+    main([str(cohort_csv)])
+    ics = capsys.readouterr().out
+    assert ics.count("BEGIN:VEVENT") == 4
+
+def test_cli_reports_bad_rows_instead_of_crashing(tmp_path, capsys):
+    cohort_csv = tmp_path / "cohort.csv"
+    cohort_csv.write_text(
+        "student_id,degree_level,is_stem_degree,program_end_date,opt_stage\n"
+        f"a,Master,true,{date.today().isoformat()},Post,extra\n"
+        f"b,Master,true,{date.today().isoformat()},Post\n"
+    )
+    main([str(cohort_csv), "--format", "csv"])
+    captured = capsys.readouterr()
+    assert len(captured.out.strip().splitlines()) == 1 + 4
+    assert "more cells than the header" in captured.err
+
+    jsonl = tmp_path / "cohort.jsonl"
+    jsonl.write_text("\n\n" + json.dumps(record("a")) + "\n{broken\n")
+    main([str(jsonl), "--format", "csv"])
+    captured = capsys.readouterr()
+    assert len(captured.out.strip().splitlines()) == 1 + 4
+    assert "Invalid JSON" in captured.err
+
+def test_students_without_id_get_distinct_uids():
+    a = dict(record("x"), unemployment_days_used=0)
+    b = dict(record("x"), unemployment_days_used=5)
+    del a["student_id"], b["student_id"]
+
+    def uids(body):
+        return {line for line in body.split("\r\n") if line.startswith("UID:")}
+
+    # Separate downloads: both students are record 1, but their UIDs must not collide
+    uids_a = uids("".join(iter_ics([a])))
+    uids_b = uids("".join(iter_ics([b])))
+    assert len(uids_a) == 4 and not uids_a & uids_b
+    # The same state gives the same UIDs, so re-importing updates instead of duplicating
+    assert uids("".join(iter_ics([a]))) == uids_a
+    # An explicit student_id keeps the UID stable across state changes
+    assert uids("".join(iter_ics([dict(a, student_id="s1")]))) == uids("".join(iter_ics([dict(b, student_id="s1")])))